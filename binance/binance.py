@@ -3,15 +3,34 @@
 Spot and margin trading module for binance
 """
 
+import functools
 import random
+import string
 import hmac
 import hashlib
 import time
 import inspect
 from urllib.parse import urlencode
-from urllib3.util.retry import Retry
-import requests
-from requests.adapters import HTTPAdapter
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Seconds to reuse a fetched exchangeInfo before downloading it again
+EXCHANGE_INFO_TTL = 60
+
+# Translation table deleting every character urlencode leaves unquoted
+URL_SAFE_CHARS = str.maketrans("", "", string.ascii_letters + string.digits + "_.-~")
+
+# Translation tables deleting the characters allowed in symbols and in
+# enum params such as side and order type
+SYMBOL_CHARS = str.maketrans("", "", string.ascii_uppercase + string.digits)
+ENUM_CHARS = str.maketrans("", "", string.ascii_uppercase + "_")
+
+# (name, dtype) of the leading columns of each kline row
+KLINE_COLUMNS = (("openTime", "int64"), ("open", "float64"), ("high", "float64"),
+                 ("low", "float64"), ("close", "float64"), ("volume", "float64"),
+                 ("closeTime", "int64"), ("quoteVolume", "float64"), ("numTrades", "int64"))
 
 class Binance():
     """
@@ -28,8 +47,31 @@ class Binance():
         self.sell = "SELL"
         self.limit = "LIMIT"
         self.market = "MARKET"
-        self.options = {"apiKey":api_key, "secret":secret}
         self.debug = debug
+        self.session = None
+        self.async_session = None
+        self.async_loop = None
+        self.exchange_info_cache = None
+        self.options = {}
+        self.headers = {}
+        self.hmac = None
+        self.set(api_key, secret)
+
+    def set(self, api_key, secret):
+        """
+        Set api key and secret used for authenticated requests
+        The header and keyed HMAC are built once here rather than per request
+        """
+        self.options = {"apiKey":api_key, "secret":secret}
+        self.headers = {"X-MBX-APIKEY": api_key} if api_key else {}
+        for session in (self.session, self.async_session):
+            if session is not None:
+                session.headers.pop("X-MBX-APIKEY", None)
+                session.headers.update(self.headers)
+        # keyed HMAC state, copied for each signature to skip key setup.  With
+        # an OpenSSL sha256 digestmod this is already the C HMAC, and copying it
+        # is faster than one-shot hmac.digest() which redoes the key pads
+        self.hmac = hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256) if secret else None
 
     def prices(self):
         """Get latest prices for all symbols."""
@@ -58,6 +100,49 @@ class Binance():
         params = {"symbol": symbol}
         params.update(kwargs)
         data = self.request("GET", "/api/v1/depth", params)
+        return self.parse_depth(data)
+
+    def depth_array(self, symbol, **kwargs):
+        """Get order book as numpy arrays.
+
+        Takes the same args as depth(). Returns bids and asks as float64
+        arrays of shape (N, 2) holding [price, qty] rows, in exchange order:
+        bids from best (highest) price down, asks from best (lowest) price up.
+        Requires numpy.
+
+        """
+        # numpy is imported on first use to keep module import cheap
+        # pylint: disable=import-outside-toplevel
+        try:
+            import numpy as np
+        except ImportError as error:
+            raise ImportError("numpy is required for depth_array") from error
+        params = {"symbol": symbol}
+        params.update(kwargs)
+        data = self.request("GET", "/api/v1/depth", params)
+        return {
+            "bids": np.asarray(data["bids"], dtype=np.float64).reshape(-1, 2),
+            "asks": np.asarray(data["asks"], dtype=np.float64).reshape(-1, 2),
+        }
+
+    async def depth_many(self, symbols, concurrency=10, **kwargs):
+        """Get order books for many symbols concurrently.
+
+        Takes the same args as depth() and returns a dict of symbol to order
+        book.  Duplicate symbols are fetched once.  See arequest_many() for
+        concurrency.
+
+        """
+        symbols = list(dict.fromkeys(symbols))
+        params_list = [{"symbol": symbol, **kwargs} for symbol in symbols]
+        results = await self.arequest_many("GET", "/api/v1/depth", params_list, concurrency)
+        return {symbol: self.parse_depth(data) for symbol, data in zip(symbols, results)}
+
+    @staticmethod
+    def parse_depth(data):
+        """
+        Convert raw depth response into bids and asks dicts of price to qty
+        """
         return {
             "bids": {px: qty for px, qty, in data["bids"]},
             "asks": {px: qty for px, qty, in data["asks"]},
@@ -80,6 +165,26 @@ class Binance():
         params = {"symbol": symbol, "interval": interval}
         params.update(kwargs)
         data = self.request("GET", "/api/v1/klines", params)
+        return self.parse_klines(data)
+
+    async def klines_many(self, symbols, interval, concurrency=10, **kwargs):
+        """Get kline/candlestick bars for many symbols concurrently.
+
+        Takes the same args as klines() and returns a dict of symbol to
+        klines.  Duplicate symbols are fetched once.  See arequest_many() for
+        concurrency.
+
+        """
+        symbols = list(dict.fromkeys(symbols))
+        params_list = [{"symbol": symbol, "interval": interval, **kwargs} for symbol in symbols]
+        results = await self.arequest_many("GET", "/api/v1/klines", params_list, concurrency)
+        return {symbol: self.parse_klines(data) for symbol, data in zip(symbols, results)}
+
+    @staticmethod
+    def parse_klines(data):
+        """
+        Convert raw kline rows into dicts keyed by field name
+        """
         return [{
             "openTime": d[0],
             "open": d[1],
@@ -92,6 +197,29 @@ class Binance():
             "numTrades": d[8],
         } for d in data]
 
+    def klines_array(self, symbol, interval, **kwargs):
+        """Get kline/candlestick bars for a symbol as numpy columns.
+
+        Takes the same args as klines(). Returns a dict of numpy arrays keyed
+        by the same field names, with times and trade counts as int64 and
+        prices and volumes as float64.  Requires numpy.
+
+        """
+        # numpy is imported on first use to keep module import cheap
+        # pylint: disable=import-outside-toplevel
+        try:
+            import numpy as np
+        except ImportError as error:
+            raise ImportError("numpy is required for klines_array") from error
+        params = {"symbol": symbol, "interval": interval}
+        params.update(kwargs)
+        data = self.request("GET", "/api/v1/klines", params)
+        if not data:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in KLINE_COLUMNS}
+        rows = np.array(data, dtype=object)
+        return {name: rows[:, idx].astype(dtype) for idx, (name, dtype) in
+                enumerate(KLINE_COLUMNS)}
+
     def balances(self):
         """Get current balances for all symbols."""
         data = self.signed_request("GET", "/api/v3/account", {'recvWindow': 60000})
@@ -162,10 +290,18 @@ class Binance():
         return [x['symbol'] for x in data]
 
     def exchange_info(self):
-        """get exchange_info for all sumbols"""
-        data = self.request("GET", "/api/v3/exchangeInfo", {})
+        """
+        get exchange_info for all sumbols, cached for EXCHANGE_INFO_TTL seconds
+        Each call returns a new top level dict, but the per symbol dicts are
+        shared between callers while cached and must not be modified
+        """
+        now = time.monotonic()
+        if not self.exchange_info_cache or now - self.exchange_info_cache[0] >= EXCHANGE_INFO_TTL:
+            data = self.request("GET", "/api/v3/exchangeInfo", {})
+            info = {item['symbol']:item for item in data['symbols']}
+            self.exchange_info_cache = (now, info)
 
-        return {item['symbol']:item for item in data['symbols']}
+        return dict(self.exchange_info_cache[1])
 
     def my_margin_trades(self, symbol, isolated):
         """ Get open margin trades """
@@ -191,22 +327,14 @@ class Binance():
             icebergQty (float, str or decimal, optional): Used with iceberg orders.
 
         """
-        if order_type == "self.market":
-            params = {
-                "symbol": symbol,
-                "side": side,
-                "type": order_type,
-                "quantity": self.format_number(quantity),
-            }
-        else:
-            params = {
-                "symbol": symbol,
-                "side": side,
-                "type": order_type,
-                "quantity": self.format_number(quantity),
-            }
-
-        params.update(kwargs)
+        self.check_order(symbol, side, order_type)
+        params = {
+            "symbol": symbol,
+            "side": side,
+            "type": order_type,
+            "quantity": self.format_number(quantity),
+            **kwargs,
+        }
         path = "/api/v3/order/test" if test else "/api/v3/order"
         data = self.signed_request("POST", path, params)
         return data
@@ -304,6 +432,7 @@ class Binance():
         """
         Open a margin trade
         """
+        self.check_order(symbol, side, order_type)
         params = {
             "symbol": symbol,
             "side": side,
@@ -421,6 +550,12 @@ class Binance():
         """
         retry requests session
         """
+        # requests is imported on first use to keep module import cheap
+        # pylint: disable=import-outside-toplevel
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
         session = session or requests.Session()
         retry = Retry(
             total=retries,
@@ -429,55 +564,209 @@ class Binance():
             backoff_factor=backoff_factor,
             method_whitelist=False,
         )
-        adapter = HTTPAdapter(max_retries=retry)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
         session.mount('http://', adapter)
         session.mount('https://', adapter)
         return session
 
+    def get_session(self):
+        """
+        Get retrying requests session, creating it on first use
+        """
+        if self.session is None:
+            self.session = self.retry_session(retries=5)
+            self.session.headers.update(self.headers)
+        return self.session
+
     def request(self, method, path, params=None):
         """
         Make request to API and return result
         """
-        session = self.retry_session(retries=5)
-        resp = session.request(method, self.endpoint + path, params=params, timeout=60)
-        data = resp.json()
+        resp = self.get_session().request(method, self.endpoint + path, params=params,
+                                          timeout=60)
+        data = self.parse_json(resp)
         if self.debug:
             print(inspect.stack()[1].function, data)
         else:
             print("Calling binance api path ", path)
         return data
 
+    def signed_query(self, params):
+        """
+        Return timestamped and signed query string for given params
+        """
+        if not self.options["apiKey"]:
+            raise ValueError("Api key and secret must be set")
+
+        # urlencode output is ascii, so build and sign the query as bytes and
+        # decode once at the end
+        query = self.encode_params(params).encode("ascii")
+        query += b"&timestamp=%d" % int(time.time() * 1000)
+        query += b"&signature=" + self.sign(query).encode("ascii")
+        return query.decode("ascii")
+
+    def sign(self, payload):
+        """
+        Return hex HMAC-SHA256 signature of payload bytes using api secret
+        """
+        if self.hmac is None:
+            raise ValueError("Api key and secret must be set")
+        mac = self.hmac.copy()
+        mac.update(payload)
+        return mac.hexdigest()
+
+    def sign_many(self, payloads):
+        """
+        Return hex HMAC-SHA256 signatures for a batch of payload bytes, for
+        bulk replay of signed calls
+        """
+        return [self.sign(payload) for payload in payloads]
+
     def signed_request(self, method, path, params):
         """
         Send authenticated request
         """
-        if "apiKey" not in self.options or "secret" not in self.options:
-            raise ValueError("Api key and secret must be set")
+        query = self.signed_query(params)
+        # build url in one pass, httpx clients get base_url instead
+        url = "%s%s?%s" % (self.endpoint, path, query)
+        resp = self.get_session().request(method, url, timeout=60)
+        data = self.parse_json(resp)
+        if self.debug:
+            print(inspect.stack()[1].function, data)
+        else:
+            print("Calling binance api path ", path)
+        return data
+
+    def get_async_session(self):
+        """
+        Get HTTP/2 async client for the running event loop, creating it on first
+        use.  Pooled connections are bound to the loop that opened them, so a
+        new client is built when called from a different loop, eg. a second
+        asyncio.run().  The old client can't be closed from the new loop, so
+        callers must await close_async_session() before their loop ends.
+        Requires the optional httpx[http2] dependency
+        """
+        # httpx and asyncio are imported on first use to keep module import cheap
+        # pylint: disable=import-outside-toplevel
+        import asyncio
+        try:
+            import httpx
+        except ImportError as error:
+            raise ImportError("httpx[http2] is required for async requests") from error
+
+        loop = asyncio.get_running_loop()
+        if self.async_session is None or self.async_loop is not loop:
+            self.async_loop = loop
+            self.async_session = httpx.AsyncClient(
+                base_url=self.endpoint,
+                http2=True,
+                timeout=60,
+                headers=self.headers,
+                limits=httpx.Limits(max_keepalive_connections=8),
+            )
+        return self.async_session
+
+    async def close_async_session(self):
+        """
+        Close async client and release its connections
+        Await this before the event loop that used the client ends
+        """
+        if self.async_session is not None:
+            await self.async_session.aclose()
+            self.async_session = None
+            self.async_loop = None
+
+    async def arequest(self, method, path, params=None):
+        """
+        Make async request to API and return result
+        Concurrent calls are multiplexed over a single HTTP/2 connection
+        """
+        resp = await self.get_async_session().request(method, path, params=params)
+        data = self.parse_json(resp)
+        if self.debug:
+            # path too, as the caller is often a gather wrapper
+            print(inspect.stack()[1].function, path, data)
+        else:
+            print("Calling binance api path ", path)
+        return data
+
+    async def arequest_many(self, method, path, params_list, concurrency=10):
+        """
+        Make async requests to one path for each params dict, returning
+        results in the same order.  At most concurrency requests are in
+        flight at once to stay inside the api weight limits.
+        All or nothing: the first request to raise is re-raised and the
+        results of the rest of the batch are discarded
+        """
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(params):
+            async with semaphore:
+                return await self.arequest(method, path, params)
 
-        query = urlencode(sorted(params.items()))
-        query += "&timestamp={}".format(int(time.time() * 1000))
-        secret = bytes(self.options["secret"].encode("utf-8"))
-        signature = hmac.new(secret, query.encode("utf-8"),
-                             hashlib.sha256).hexdigest()
-        query += "&signature={}".format(signature)
-
-        session = self.retry_session(retries=5)
-        resp = session.request(method,
-                               self.endpoint + path + "?" + query, timeout=60,
-                               headers={"X-MBX-APIKEY": self.options["apiKey"]})
-        data = resp.json()
+        return await asyncio.gather(*[limited(params) for params in params_list])
+
+    async def asigned_request(self, method, path, params):
+        """
+        Send async authenticated request
+        """
+        query = self.signed_query(params)
+        resp = await self.get_async_session().request(method, path + "?" + query)
+        data = self.parse_json(resp)
         if self.debug:
             print(inspect.stack()[1].function, data)
         else:
             print("Calling binance api path ", path)
         return data
 
+    @staticmethod
+    def check_order(symbol, side, order_type):
+        """
+        Raise ValueError unless symbol is uppercase alphanumeric and side and
+        order type are uppercase enum names, before they go into the url
+        """
+        for value, table in ((symbol, SYMBOL_CHARS), (side, ENUM_CHARS),
+                             (order_type, ENUM_CHARS)):
+            if not isinstance(value, str) or not value or value.translate(table):
+                raise ValueError("Invalid order param: {}".format(value))
+
+    @staticmethod
+    def encode_params(params):
+        """
+        Return params as a query string in insertion order, skipping urlencode's
+        per-value quoting when all keys and values are already url safe
+        """
+        query = "&".join(["%s=%s" % item for item in params.items()])
+        # only the joining "&" and "=" chars may survive deleting safe chars
+        if len(query.translate(URL_SAFE_CHARS)) != 2 * len(params) - 1:
+            return urlencode(params)
+        return query
+
+    @staticmethod
+    def parse_json(resp):
+        """
+        Decode JSON response body, using orjson if available
+        """
+        # orjson is a C extension pylint can't introspect
+        return orjson.loads(resp.content) if orjson else resp.json()  # pylint: disable=no-member
+
     @staticmethod
     def format_number(number):
         """
         Format decimal to 8dp if float
+        Non-zero floats go through a cache, zero skips it as 0.0 == -0.0
         """
         if isinstance(number, float):
-            return "{:.8f}".format(number)
+            return Binance.format_float(number) if number else "{:.8f}".format(number)
         else:
             return str(number)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def format_float(number):
+        """
+        Format float to 8dp, cached as order quantities usually repeat
+        """
+        return "{:.8f}".format(number)
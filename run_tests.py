@@ -13,6 +13,8 @@ from tests.print_format import SuppressStdoutStderr
 from tests.finish import finish_test, create_link
 from tests.__init__ import __all__
 from tests import test_lint
+from tests import test_encode
+from tests import test_async
 
 # Tuple of tuples
 # (name, module)
@@ -8,6 +8,7 @@ setup(name='binance',
       packages=find_packages(),
       version='0.35',
       py_modules=['binance'],
+      extras_require={'http2': ['httpx[http2]'], 'orjson': ['orjson'], 'numpy': ['numpy']},
       description='Binance API wrapper',
       url='https://github.com/toshima/binance',
       author='Takaki Oshima',
@@ -0,0 +1,75 @@
+"""Test async requests"""
+
+import asyncio
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from binance.binance import Binance
+try:
+    import httpx
+    import h2
+except ImportError:
+    httpx = h2 = None
+
+KLINE = [1508472300000, "0.00023769", "0.00023780", "0.00023768", "0.00023780",
+         "293.00000000", 1508472359999, "0.06964315", 7, "0", "0", "0"]
+
+class KlineHandler(BaseHTTPRequestHandler):
+    """Keep-alive handler returning a single kline for any GET"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """return one kline row"""
+        body = json.dumps([KLINE]).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """silence request logging"""
+
+@unittest.skipIf(httpx is None or h2 is None, "httpx[http2] not installed")
+class TestAsync(unittest.TestCase):
+    """Test Async Unittest"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), KlineHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_separate_event_loops(self):
+        """
+        test one client used from two asyncio.run calls
+        """
+        client = Binance(endpoint="http://127.0.0.1:{}".format(self.server.server_port))
+
+        async def fetch():
+            try:
+                return await client.klines_many(["BNBBTC", "ETHBTC"], "1m")
+            finally:
+                await client.close_async_session()
+
+        for _ in range(2):
+            result = asyncio.run(fetch())
+            self.assertEqual(sorted(result), ["BNBBTC", "ETHBTC"])
+            self.assertEqual(result["ETHBTC"][0]["close"], "0.00023780")
+
+    def test_symbol_generator(self):
+        """
+        test symbols given as a generator, with duplicates
+        """
+        client = Binance(endpoint="http://127.0.0.1:{}".format(self.server.server_port))
+
+        async def fetch():
+            try:
+                symbols = (symbol for symbol in ["BNBBTC", "ETHBTC", "BNBBTC"])
+                return await client.klines_many(symbols, "1m")
+            finally:
+                await client.close_async_session()
+
+        self.assertEqual(list(asyncio.run(fetch())), ["BNBBTC", "ETHBTC"])
@@ -0,0 +1,39 @@
+"""Test query string encoding"""
+
+import unittest
+from urllib.parse import urlencode
+from binance.binance import Binance
+
+class TestEncode(unittest.TestCase):
+    """Test Encode Unittest"""
+
+    def test_matches_urlencode(self):
+        """
+        test encode_params against urlencode
+        """
+        cases = [
+            {},
+            {"symbol": "BNBBTC", "side": "BUY", "type": "STOP_LOSS_LIMIT",
+             "quantity": "1.00000000", "recvWindow": 60000, "price": 0.5},
+            {"newClientOrderId": "my order 1"},
+            {"note": "a=b", "other": "c&d"},
+            {"a=b": "1", "c&d": "2"},
+            {"": "empty key", "empty": ""},
+            {"asset": "BTC€", "ключ": "значение"},
+            {"raw": b"bytes value", "empty": b""},
+            {"ids": [1, 2], "pair": ("BNB", "BTC")},
+            {"asset": None, "isIsolated": False, "sideEffect": True},
+            {"tilde": "a~b-c.d_e", "plus": "1+1", "pct": "100%"},
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                self.assertEqual(Binance.encode_params(params), urlencode(params))
+
+    def test_insertion_order(self):
+        """
+        test params are encoded in insertion order, not sorted
+        """
+        params = {"symbol": "BNBBTC", "side": "SELL", "amount": "2"}
+        self.assertEqual(Binance.encode_params(params), "symbol=BNBBTC&side=SELL&amount=2")
+        params = {"symbol": "BNB BTC", "amount": "2"}
+        self.assertEqual(Binance.encode_params(params), "symbol=BNB+BTC&amount=2")